@@ -0,0 +1,209 @@
+"""Procedural level generators.
+
+Generates mazes, rooms, noise-based caves and clusters of points without a
+display, and can write thousands of them straight to disk as levels.
+"""
+
+import os
+import pickle
+import random
+import argparse
+
+from typing import List, Tuple
+
+# Keeps the generator from greeting on import
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import simulation
+
+
+# Size of a generated level in columns and rows
+SIZE = (simulation.NUM_COLUMNS, simulation.NUM_ROWS)
+
+
+def _filled_grid(size: Tuple[int, int], tile: int) -> List[List[int]]:
+    """Generates a grid of <size> columns and rows filled with <tile>.
+    """
+    return [[tile] * size[1] for _ in range(size[0])]
+
+
+def _clear_start(grid: List[List[int]]) -> None:
+    """Makes sure the tile creatures start on is not a wall.
+    """
+    x, y = simulation.Creature.START
+    if grid[x][y] == 1:
+        grid[x][y] = 0
+
+
+def maze(rng: random.Random, size: Tuple[int, int] = SIZE
+         ) -> List[List[int]]:
+    """Generates a maze with corridors one tile wide using a randomized
+    depth-first search.
+    """
+    grid = _filled_grid(size, 1)
+
+    # Cells are the tiles at odd positions, walls are knocked down between
+    start_x, start_y = simulation.Creature.START
+    start = (min(start_x | 1, size[0] - 2), min(start_y | 1, size[1] - 2))
+    grid[start[0]][start[1]] = 0
+    stack = [start]
+    while stack:
+        x, y = stack[-1]
+
+        # Finds the neighbouring cells that have not been carved yet
+        neighbours = [(x + dx, y + dy)
+                      for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                      if 0 < x + dx < size[0] - 1 and 0 < y + dy < size[1] - 1
+                      and grid[x + dx][y + dy] == 1]
+        if not neighbours:
+            stack.pop()
+            continue
+
+        # Carves through to a random one
+        next_x, next_y = rng.choice(neighbours)
+        grid[(x + next_x) // 2][(y + next_y) // 2] = 0
+        grid[next_x][next_y] = 0
+        stack.append((next_x, next_y))
+
+    _clear_start(grid)
+    return grid
+
+
+def rooms(rng: random.Random, size: Tuple[int, int] = SIZE,
+          num_rooms: int = 8) -> List[List[int]]:
+    """Generates up to <num_rooms> rectangular rooms joined by corridors,
+    with the first room around the starting position.
+    """
+    grid = _filled_grid(size, 1)
+
+    centres = [simulation.Creature.START]
+    for _ in range(num_rooms - 1):
+        centres.append((rng.randint(2, size[0] - 3),
+                        rng.randint(2, size[1] - 3)))
+
+    previous = None
+    for x, y in centres:
+        # Carves the room, keeping a wall around the level
+        width = rng.randint(2, max(2, size[0] // 8))
+        height = rng.randint(2, max(2, size[1] // 8))
+        for i in range(max(1, x - width), min(size[0] - 1, x + width + 1)):
+            for j in range(max(1, y - height),
+                           min(size[1] - 1, y + height + 1)):
+                grid[i][j] = 0
+
+        # Joins it to the previous room with an L-shaped corridor
+        if previous is not None:
+            for i in range(min(x, previous[0]), max(x, previous[0]) + 1):
+                grid[i][previous[1]] = 0
+            for j in range(min(y, previous[1]), max(y, previous[1]) + 1):
+                grid[x][j] = 0
+        previous = (x, y)
+
+    _clear_start(grid)
+    return grid
+
+
+def noise(rng: random.Random, size: Tuple[int, int] = SIZE,
+          density: float = 0.45, smoothing: int = 4) -> List[List[int]]:
+    """Generates cave-like walls by smoothing random noise of <density>
+    <smoothing> times with a cellular automaton.
+    """
+    grid = [[1 if rng.random() < density else 0 for _ in range(size[1])]
+            for _ in range(size[0])]
+
+    for _ in range(smoothing):
+        smoothed = _filled_grid(size, 0)
+        for i in range(size[0]):
+            for j in range(size[1]):
+                # Counts the walls around the tile, looping like the level
+                walls = 0
+                for dx in (-1, 0, 1):
+                    for dy in (-1, 0, 1):
+                        if dx != 0 or dy != 0:
+                            walls += grid[(i + dx) % size[0]][
+                                (j + dy) % size[1]]
+
+                # Walls stay if they are crowded, and grow if very crowded
+                if walls >= 5 or (walls == 4 and grid[i][j] == 1):
+                    smoothed[i][j] = 1
+        grid = smoothed
+
+    _clear_start(grid)
+    return grid
+
+
+def point_clusters(grid: List[List[int]], rng: random.Random,
+                   num_clusters: int = 6, radius: int = 4,
+                   density: float = 0.5) -> List[List[int]]:
+    """Scatters <num_clusters> clusters of points over the empty tiles of
+    <grid>, each filling tiles within <radius> of its centre at the rate of
+    <density>.
+
+    Returns the same grid.
+    """
+    columns, rows = len(grid), len(grid[0])
+    for _ in range(num_clusters):
+        x, y = rng.randrange(columns), rng.randrange(rows)
+        for i in range(x - radius, x + radius + 1):
+            for j in range(y - radius, y + radius + 1):
+                within = (i - x) ** 2 + (j - y) ** 2 <= radius ** 2
+                if (within and grid[i % columns][j % rows] == 0
+                        and rng.random() < density):
+                    grid[i % columns][j % rows] = 2
+    return grid
+
+
+def empty(rng: random.Random, size: Tuple[int, int] = SIZE
+          ) -> List[List[int]]:
+    """Generates an empty level, mostly useful with point clusters.
+    """
+    return _filled_grid(size, 0)
+
+
+# Generators by the name they are chosen with
+GENERATORS = {'maze': maze,
+              'rooms': rooms,
+              'noise': noise,
+              'empty': empty}
+
+
+def main() -> None:
+    """Writes generated levels to disk from the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("kind", choices=sorted(GENERATORS),
+                        help="kind of level to generate")
+    parser.add_argument("-n", "--count", type=int, default=1,
+                        help="number of levels to generate (default: 1)")
+    parser.add_argument("--clusters", type=int, default=0,
+                        help="point clusters to add to each level "
+                             "(default: 0)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first level, each next level "
+                             "uses the next seed (default: 0)")
+    parser.add_argument("--output", default=simulation.LEVEL_PATH,
+                        help="directory to write the levels to "
+                             "(default: %(default)s)")
+    args = parser.parse_args()
+
+    # Creates the output directory if it did not exist
+    if not os.path.exists(args.output):
+        os.makedirs(args.output)
+
+    for seed in range(args.seed, args.seed + args.count):
+        # Seeds every level on its own so any of them can be regenerated
+        rng = random.Random(seed)
+        grid = GENERATORS[args.kind](rng)
+        if args.clusters > 0:
+            point_clusters(grid, rng, args.clusters)
+
+        # Saves the level the same way the level creator does
+        name = "%s-%05d" % (args.kind, seed)
+        with open(os.path.join(args.output, name), "wb+") as save:
+            pickle.dump(grid, save)
+
+    print("Wrote %d levels to %s" % (args.count, args.output))
+
+
+if __name__ == '__main__':
+    main()
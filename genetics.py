@@ -6,20 +6,55 @@ import random
 
 from typing import List, Tuple, Dict
 
+import numpy as np
+
 
 # Directions that a creature can move
 # Structured such that DIRECTIONS[i] is reversed by DIRECTIONS[-(i + 1)]
 DIRECTIONS = ('U', 'R', 'DL', 'DR', 'UL', 'UR', 'L', 'D')
 
-# Percentage of creatures to be used to create the next generation
+# Index of each direction in DIRECTIONS
+INDICES = {direction: i for i, direction in enumerate(DIRECTIONS)}
+
+# Default percentage of creatures to be used to create the next generation
 TOP_CREATURES_PERCENTAGE = 0.15
 
-# Threshold which determines if a random gene should be created for a child
+# Default threshold which determines if a random gene should be created
+# for a child
 MUTATION_THRESHOLD = 0.02
 
-# Threshold which determines which parent a child should take a gene from
-# (equal chance for both parents)
-CROSSOVER_THRESHOLD = (1 + MUTATION_THRESHOLD) / 2
+
+class GeneticConfig:
+    """Parameters of the genetic algorithm for a single run.
+
+    === Public Attributes ===
+    top_percentage:
+        percentage of creatures to be used to create the next generation
+    mutation_threshold:
+        threshold which determines if a random gene should be created
+        for a child
+    crossover_threshold:
+        threshold which determines which parent a child should take a gene
+        from (equal chance for both parents)
+    mutation_no_reversal:
+        whether mutated genes must not reverse, or be reversed by,
+        the genes next to them
+    """
+    top_percentage: float
+    mutation_threshold: float
+    crossover_threshold: float
+    mutation_no_reversal: bool
+
+    def __init__(self, top_percentage: float = TOP_CREATURES_PERCENTAGE,
+                 mutation_threshold: float = MUTATION_THRESHOLD,
+                 mutation_no_reversal: bool = False) -> None:
+        """Initializes the parameters, deriving the crossover threshold
+        from the mutation threshold.
+        """
+        self.top_percentage = top_percentage
+        self.mutation_threshold = mutation_threshold
+        self.crossover_threshold = (1 + mutation_threshold) / 2
+        self.mutation_no_reversal = mutation_no_reversal
 
 
 class PopulationController:
@@ -30,20 +65,35 @@ class PopulationController:
         current population, which is a list of individuals
     gene_length:
         length of the genes, which is the amount of moves
+    config:
+        parameters of the genetic algorithm
     """
     pop: List['Individual']
     gene_length: int
+    config: 'GeneticConfig'
+
+    # === Private Attributes ===
+    # _rng:
+    #   generator the genomes of the population are drawn from
+    _rng: np.random.Generator
 
-    def __init__(self, gene_length: int, num_individuals: int) -> None:
+    def __init__(self, gene_length: int, num_individuals: int,
+                 config: 'GeneticConfig' = None) -> None:
         """Creates a list of <num_individuals> creatures with randomly
         generated genes of length <gene_length>.
+
+        Uses the default parameters if <config> is not given.
         """
         self.pop = []
         self.gene_length = gene_length
+        self.config = GeneticConfig() if config is None else config
+        self._rng = np.random.default_rng(random.getrandbits(64))
 
-        # Creates individuals based off how many creatures are required
-        for _ in range(num_individuals):
-            self.pop.append(Individual(self.gene_length))
+        # Creates individuals from a whole population's worth of genes
+        genomes = random_genome_matrix(num_individuals, self.gene_length,
+                                       self._rng)
+        for genes, genome in zip(genomes_to_genes(genomes), genomes):
+            self.pop.append(Individual(self.gene_length, genes, genome))
 
     def create_new_generation(self) -> None:
         """ Creates a new generation based on favourable characteristics
@@ -51,7 +101,8 @@ class PopulationController:
         """
         # Sorts the current population and gets a top percentage to compete
         sorted_pop = sorted(self.pop, key=lambda x: x.fitness, reverse=True)
-        tournament = sorted_pop[:int(len(self.pop) * TOP_CREATURES_PERCENTAGE)]
+        num_top = int(len(self.pop) * self.config.top_percentage)
+        tournament = sorted_pop[:max(num_top, 1)]
 
         # Empties the population to create a new set
         # and adds the top-performer to the population
@@ -63,7 +114,7 @@ class PopulationController:
             # Crosses over to create a child and appends it to the population
             child = crossover(random.choice(tournament),
                               random.choice(tournament),
-                              self.gene_length)
+                              self.gene_length, self.config, self._rng)
             self.pop.append(child)
 
     def calculate_fitness_statistics(self) -> Tuple[float, float, float]:
@@ -100,39 +151,49 @@ class Individual:
         measure of how well this individual has done
     genes:
         this individual's genes, which are the moves it will take
+    genome:
+        this individual's genes as an array of indices into DIRECTIONS
     """
     fitness: float
     genes: List[str]
+    genome: np.ndarray
 
-    def __init__(self, gene_length: int) -> None:
-        """Initializes a creature with random genes.
+    def __init__(self, gene_length: int, genes: List[str] = None,
+                 genome: np.ndarray = None) -> None:
+        """Initializes a creature with the given genes, or random genes if
+        none are given, and works out its genome from them if it is not
+        given.
         """
         self.fitness = 0
         self.genes = []
 
         # Assigns genes
-        self.randomly_assign_genes(gene_length)
+        if genes is None:
+            self.randomly_assign_genes(gene_length)
+        else:
+            self.genes = genes
+
+        # Keeps the genes as indices too, so they are never converted again
+        if genome is None:
+            genome = genes_to_genome(self.genes)
+        self.genome = genome
 
     def randomly_assign_genes(self, gene_length: int) -> None:
         """Randomly, but intelligently, assigns genes to the individual.
         """
-        # Runs through the number of movements
-        # and intelligently assigns a random one
-        counter = 0
-        past_move = ""
-        while counter < gene_length:
-            # Chooses a random move index
-            rand = random.randint(0, len(DIRECTIONS) - 1)
-
-            # Makes sure the move does not just reverse the previous one
-            check_move = DIRECTIONS[-(rand + 1)]
-            if check_move == past_move:
-                continue
-
-            # Inserts the move
-            past_move = DIRECTIONS[rand]
-            self.genes.append(past_move)
-            counter += 1
+        if gene_length < 1:
+            return
+
+        # The first move can be anything
+        move = random.randrange(len(DIRECTIONS))
+        self.genes.append(DIRECTIONS[move])
+
+        # Chooses every other move directly from the seven moves that do not
+        # just reverse the previous one, see random_genome_matrix
+        for _ in range(gene_length - 1):
+            move = ((random.randrange(len(DIRECTIONS) - 1) - move)
+                    % len(DIRECTIONS))
+            self.genes.append(DIRECTIONS[move])
 
     # def gene_frequency(self) -> Dict[str, int]:
     #     """Returns a dictionary with each gene type and the amount
@@ -145,21 +206,90 @@ class Individual:
     #         freq["gene"] += 1
 
 
-def crossover(parent1: 'Individual', parent2: 'Individual',
-              gene_length: int) -> 'Individual':
+def crossover(parent1: 'Individual', parent2: 'Individual', gene_length: int,
+              config: 'GeneticConfig' = None,
+              rng: np.random.Generator = None) -> 'Individual':
     """Crosses over the two parents to create a child, also includes mutations.
     Returns the evolved child.
+
+    Uses the default parameters if <config> is not given, and a generator
+    seeded from the random module if <rng> is not given.
     """
-    child = Individual(gene_length)
-
-    # Assigns parents' (or random) genes to the new child
-    for i in range(len(parent1.genes)):
-        rand = random.random()
-        if rand <= MUTATION_THRESHOLD:
-            child.genes[i] = random.choice(DIRECTIONS)
-        elif rand <= CROSSOVER_THRESHOLD:
-            child.genes[i] = parent1.genes[i]
-        else:
-            child.genes[i] = parent2.genes[i]
+    if config is None:
+        config = GeneticConfig()
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+
+    # Assigns parents' (or random) genes to the new child, all at once
+    rand = rng.random(gene_length)
+    genome = np.where(rand <= config.crossover_threshold,
+                      parent1.genome, parent2.genome)
+    mutations = np.flatnonzero(rand <= config.mutation_threshold)
+    genome[mutations] = rng.integers(0, len(DIRECTIONS), size=len(mutations),
+                                     dtype=np.uint8)
+
+    # Redraws mutated genes so they do not reverse or get reversed by their
+    # neighbours, once all the neighbours are known. Index i is reversed by
+    # index 7 - i.
+    if config.mutation_no_reversal:
+        last = len(DIRECTIONS) - 1
+        for i in mutations.tolist():
+            banned = set()
+            if i > 0:
+                banned.add(last - int(genome[i - 1]))
+            if i < gene_length - 1:
+                banned.add(last - int(genome[i + 1]))
+            genome[i] = rng.choice([move for move in range(len(DIRECTIONS))
+                                    if move not in banned])
+
+    return Individual(gene_length, genomes_to_genes(genome), genome)
+
+
+def random_genome_matrix(num_genomes: int, gene_length: int,
+                         rng: np.random.Generator = None) -> np.ndarray:
+    """Randomly creates the genes of <num_genomes> individuals at once.
+
+    Returns a <num_genomes> by <gene_length> array of indices into
+    DIRECTIONS, where no move just reverses the previous one. Uses a
+    generator seeded from the random module if <rng> is not given.
+    """
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+
+    # Index i is reversed by index 7 - i, so taking each move to be
+    # (r - previous) % 8 with r drawn from 0 to 6 picks uniformly from the
+    # seven moves that are allowed. Moves are laid out one per row so each
+    # step is a single subtraction across the whole population.
+    moves = rng.integers(0, len(DIRECTIONS) - 1,
+                         size=(gene_length, num_genomes), dtype=np.uint8)
+    if gene_length == 0:
+        return moves.T
+    moves[0] = rng.integers(0, len(DIRECTIONS), size=num_genomes,
+                            dtype=np.uint8)
+
+    # uint8 wraps around modulo 256, which keeps the result exact modulo 8
+    for i in range(1, gene_length):
+        np.subtract(moves[i], moves[i - 1], out=moves[i])
+    moves &= len(DIRECTIONS) - 1
+
+    return moves.T
+
+
+def genomes_to_genes(genomes: np.ndarray) -> List:
+    """Converts a matrix from random_genome_matrix into lists of genes, or
+    a single genome into a list of genes.
+    """
+    return np.array(DIRECTIONS)[genomes].tolist()
 
-    return child
\ No newline at end of file
+
+def genes_to_genome(genes: List[str]) -> np.ndarray:
+    """Converts a list of genes into an array of indices into DIRECTIONS.
+    """
+    return np.array([INDICES[gene] for gene in genes], dtype=np.uint8)
+
+
+def individuals_to_genomes(pop: List['Individual']) -> np.ndarray:
+    """Stacks the genomes of every individual in <pop> into a matrix of
+    indices into DIRECTIONS, one row per individual.
+    """
+    return np.array([ind.genome for ind in pop], dtype=np.uint8)
\ No newline at end of file
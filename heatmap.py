@@ -0,0 +1,46 @@
+"""Counts of how often the population visits each tile of a level.
+"""
+
+import numpy as np
+
+from typing import BinaryIO, Tuple
+
+
+class VisitHeatmap:
+    """Number of times each tile of a level was visited by any creature.
+
+    === Public Attributes ===
+    counts:
+        array of visit counts indexed by column and then row,
+        the same way as a level grid
+    """
+    counts: np.ndarray
+
+    def __init__(self, size: Tuple[int, int]) -> None:
+        """Initializes an empty heatmap for a level of <size> columns
+        and rows.
+        """
+        self.counts = np.zeros(size, dtype=np.int64)
+
+    def add(self, cells: np.ndarray) -> None:
+        """Adds a visit for every flat cell index in the array <cells>, of
+        any shape, where a cell index is column * number of rows + row.
+        """
+        # Counts all the visits at once rather than tile by tile
+        flat = self.counts.reshape(-1)
+        flat += np.bincount(cells.reshape(-1), minlength=flat.size)
+
+    def total(self) -> int:
+        """Returns the total number of visits counted.
+        """
+        return int(self.counts.sum())
+
+    def reset(self) -> None:
+        """Sets every count back to zero.
+        """
+        self.counts.fill(0)
+
+    def dump(self, save: BinaryIO) -> None:
+        """Dumps the counts into a save file in NumPy's format.
+        """
+        np.save(save, self.counts)
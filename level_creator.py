@@ -2,14 +2,59 @@
 """
 
 import os
+import random
+
+from typing import List, Tuple
+
 import pygame
 
 import simulation
+import generators
 
 
 # Display constants
 SCREEN_TITLE = "Level Creator"
 
+# Mouse buttons
+LEFT_BUTTON = 1
+RIGHT_BUTTON = 3
+
+# Brushes and the keys that choose them
+PENCIL = "pencil"
+RECTANGLE = "rectangle"
+FILL = "fill"
+BRUSH_KEYS = {pygame.K_b: PENCIL, pygame.K_r: RECTANGLE, pygame.K_f: FILL}
+
+# Generators and the keys that run them
+GENERATOR_KEYS = {pygame.K_1: generators.maze,
+                  pygame.K_2: generators.rooms,
+                  pygame.K_3: generators.noise}
+
+
+def _grid_position(mouse_pos: Tuple[int, int]) -> Tuple[int, int]:
+    """Gets the position on the grid under the mouse, kept on the level
+    even when a drag goes outside the window.
+    """
+    return (max(0, min(mouse_pos[0] // simulation.TILE_SIZE,
+                       simulation.NUM_COLUMNS - 1)),
+            max(0, min(mouse_pos[1] // simulation.TILE_SIZE,
+                       simulation.NUM_ROWS - 1)))
+
+
+def _replace_level(level: simulation.Level,
+                   grid: List[List[int]]) -> List[Tuple[int, int]]:
+    """Sets every tile of <level> to the one in <grid>.
+
+    Returns the positions that changed.
+    """
+    changed = []
+    for i, column in enumerate(grid):
+        for j, tile in enumerate(column):
+            if level.get_tile_at((i, j)) != tile:
+                level.set_tile_at((i, j), tile)
+                changed.append((i, j))
+    return changed
+
 
 def main() -> None:
     """Runs the level creator.
@@ -19,6 +64,9 @@ def main() -> None:
     print("Left click on the screen to draw and right click to erase.")
     print("Left arrow key will make you draw points (green), " +
           "and right will make you draw walls (white).")
+    print("B draws single tiles, R draws rectangles by dragging, " +
+          "and F fills connected areas.")
+    print("1 generates a maze, 2 rooms, 3 caves, and 4 adds point clusters.")
     print("Close the window to save your level.")
     input("Press enter to continue. \n")
 
@@ -28,39 +76,79 @@ def main() -> None:
     display = pygame.display.set_mode(simulation.SCREEN_SIZE)
     pygame.display.set_caption(SCREEN_TITLE)
 
-    # Keeps track if the editor is closed and which tile is being added
+    # Draws the whole level once, afterwards only changed tiles are drawn
+    level.draw(display)
+    pygame.display.update()
+
+    # Keeps track if the editor is closed, which tile is being added,
+    # which brush is used, and where a rectangle was started
     editing = True
     adding = 1
+    brush = PENCIL
+    rect_start = None
+    rng = random.Random()
 
     # Runs until editing is finished
     while editing:
-        # Event handler
-        for event in pygame.event.get():
-            # Ends the editor on quit
-            if event.type == pygame.QUIT:
-                editing = False
+        # Waits for something to happen instead of redrawing constantly
+        event = pygame.event.wait()
+        changed = []
+
+        # Ends the editor on quit
+        if event.type == pygame.QUIT:
+            editing = False
 
+        elif event.type == pygame.KEYDOWN:
             # Sets the tile to add
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_LEFT:
-                    adding = 2
-                if event.key == pygame.K_RIGHT:
-                    adding = 1
-
-        # Gets mouse position and its respective position on the grid
-        mouse_pos = pygame.mouse.get_pos()
-        grid_pos = (mouse_pos[0] // simulation.TILE_SIZE,
-                    mouse_pos[1] // simulation.TILE_SIZE)
-
-        # Adds if left mouse was pressed and removes if right mouse
-        if pygame.mouse.get_pressed()[0]:
-            level.set_tile_at(grid_pos, adding)
-        elif pygame.mouse.get_pressed()[2]:
-            level.set_tile_at(grid_pos, 0)
-
-        # Draws the level and updates the display
-        level.draw(display)
-        pygame.display.update()
+            if event.key == pygame.K_LEFT:
+                adding = 2
+            if event.key == pygame.K_RIGHT:
+                adding = 1
+
+            # Sets the brush
+            if event.key in BRUSH_KEYS:
+                brush = BRUSH_KEYS[event.key]
+
+            # Replaces the level with a generated one, or adds points to it
+            if event.key in GENERATOR_KEYS:
+                changed = _replace_level(level, GENERATOR_KEYS[event.key](rng))
+            if event.key == pygame.K_4:
+                grid = level.copy_grid()
+                generators.point_clusters(grid, rng)
+                changed = _replace_level(level, grid)
+
+        # Paints, fills, or starts a rectangle on a mouse press
+        elif (event.type == pygame.MOUSEBUTTONDOWN
+              and event.button in (LEFT_BUTTON, RIGHT_BUTTON)):
+            tile = adding if event.button == LEFT_BUTTON else 0
+            grid_pos = _grid_position(event.pos)
+            if brush == PENCIL:
+                changed = level.fill_rect(grid_pos, grid_pos, tile)
+            elif brush == FILL:
+                changed = level.flood_fill(grid_pos, tile)
+            else:
+                rect_start = grid_pos
+
+        # Keeps painting while the mouse is dragged with a button held
+        elif event.type == pygame.MOUSEMOTION and brush == PENCIL:
+            grid_pos = _grid_position(event.pos)
+            if event.buttons[0]:
+                changed = level.fill_rect(grid_pos, grid_pos, adding)
+            elif event.buttons[2]:
+                changed = level.fill_rect(grid_pos, grid_pos, 0)
+
+        # Finishes a rectangle when the mouse is released
+        elif (event.type == pygame.MOUSEBUTTONUP and rect_start is not None
+              and event.button in (LEFT_BUTTON, RIGHT_BUTTON)):
+            tile = adding if event.button == LEFT_BUTTON else 0
+            changed = level.fill_rect(rect_start, _grid_position(event.pos),
+                                      tile)
+            rect_start = None
+
+        # Draws only the tiles that changed and updates just those
+        if changed:
+            pygame.display.update([level.draw_tile(display, position)
+                                   for position in changed])
 
     # Quits PyGame window
     pygame.quit()
@@ -0,0 +1,194 @@
+"""Offline replay of recorded creature paths.
+
+Animates a recorded path in a window, or exports it as PNG frames or a
+heatmap without needing a display.
+"""
+
+import os
+import time
+import argparse
+
+from typing import List, Tuple
+
+import pygame
+
+import matplotlib.pyplot as plt
+
+import simulation
+import trajectory
+
+
+# Display constants
+SCREEN_TITLE = "Replay"
+
+# Color of the tiles a creature has already passed through
+BLUE = (0, 0, 255)
+
+
+class Replay:
+    """Renders a single recorded path on the level it was recorded on.
+
+    === Public Attributes ===
+    positions:
+        every position along the path, including the starting position
+    """
+    positions: List[Tuple[int, int]]
+
+    # === Private Attributes ===
+    # _background:
+    #   level with the already travelled part of the path drawn on it
+    # _shown:
+    #   number of positions drawn on the background so far
+    _background: pygame.Surface
+    _shown: int
+
+    def __init__(self, recorder: trajectory.TrajectoryRecorder,
+                 path: trajectory.Trajectory) -> None:
+        """Initializes a replay of <path> from <recorder>.
+        """
+        size = recorder.get_size()
+        self.positions = path.positions(recorder.start, size)
+
+        # Draws the level once, the path is drawn over it as it goes
+        level = simulation.Level(blueprint=recorder.grid, chance=0)
+        self._background = pygame.Surface((size[0] * simulation.TILE_SIZE,
+                                           size[1] * simulation.TILE_SIZE))
+        level.draw(self._background)
+        self._shown = 0
+
+    def __len__(self) -> int:
+        """Returns the number of frames in this replay.
+        """
+        return len(self.positions)
+
+    def draw(self, surface: pygame.Surface, frame: int) -> None:
+        """Draws frame number <frame> onto <surface>.
+
+        Frames must be drawn in increasing order.
+        """
+        # Adds the tiles travelled since the last frame to the background
+        while self._shown < frame:
+            _draw_tile(self._background, self.positions[self._shown], BLUE)
+            self._shown += 1
+
+        # Draws the background with the creature at its current position
+        surface.blit(self._background, (0, 0))
+        _draw_tile(surface, self.positions[frame], simulation.RED)
+
+
+def _draw_tile(surface: pygame.Surface, position: Tuple[int, int],
+               color: Tuple[int, int, int]) -> None:
+    """Draws a single tile of <color> at <position> onto <surface>.
+    """
+    tile_rect = pygame.Rect(position[0] * simulation.TILE_SIZE,
+                            position[1] * simulation.TILE_SIZE,
+                            simulation.TILE_SIZE, simulation.TILE_SIZE)
+    pygame.draw.rect(surface, color, tile_rect)
+
+
+def animate(replay: 'Replay', interval: int = 20) -> None:
+    """Animates <replay> in a window, waiting <interval> milliseconds
+    between moves.
+    """
+    pygame.init()
+    display = pygame.display.set_mode(simulation.SCREEN_SIZE)
+    pygame.display.set_caption(SCREEN_TITLE)
+
+    for frame in range(len(replay)):
+        # Stops early if the window was closed
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+
+        replay.draw(display, frame)
+        pygame.display.update()
+        time.sleep(interval / 1000)
+
+    # Keeps the last frame up until the window is closed
+    while pygame.event.wait().type != pygame.QUIT:
+        pass
+    pygame.quit()
+
+
+def export_frames(replay: 'Replay', directory: str) -> None:
+    """Exports every frame of <replay> as a PNG image into <directory>.
+
+    Does not need a display.
+    """
+    # Creates the directory if it did not exist
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    surface = pygame.Surface(simulation.SCREEN_SIZE)
+    for frame in range(len(replay)):
+        replay.draw(surface, frame)
+        pygame.image.save(surface,
+                          os.path.join(directory, "%05d.png" % frame))
+
+
+def export_heatmap(recorder: trajectory.TrajectoryRecorder,
+                   paths: List[trajectory.Trajectory], filename: str) -> None:
+    """Exports a heatmap of how often each tile was visited by <paths>
+    to the image <filename>.
+
+    Does not need a display.
+    """
+    # Counts visits as a list of rows so that it is drawn the right way up
+    columns, rows = recorder.get_size()
+    counts = [[0] * columns for _ in range(rows)]
+    for path in paths:
+        for x, y in path.positions(recorder.start, (columns, rows)):
+            counts[y][x] += 1
+
+    # Shades the walls of the level, other tiles are left transparent
+    walls = [[1.0 if recorder.grid[x][y] == 1 else float("nan")
+              for x in range(columns)] for y in range(rows)]
+
+    figure = plt.figure()
+    plt.imshow(counts, cmap="hot", interpolation="nearest")
+    plt.colorbar(label="Visits")
+    plt.imshow(walls, cmap="Greys", vmin=0, vmax=1, interpolation="nearest")
+    plt.title("Visited Tiles")
+    figure.savefig(filename)
+    plt.close(figure)
+
+
+def main() -> None:
+    """Runs the replay tool from the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("recording", help="file made by a recording run")
+    parser.add_argument("-g", "--generation", type=int, default=-1,
+                        help="generation to replay (default: last)")
+    parser.add_argument("-r", "--rank", type=int, default=0,
+                        help="rank of the individual (default: 0, the best)")
+    parser.add_argument("-i", "--interval", type=int, default=20,
+                        help="movement interval in ms (default: 20)")
+    parser.add_argument("--frames", metavar="DIRECTORY",
+                        help="export PNG frames instead of animating")
+    parser.add_argument("--heatmap", metavar="FILE",
+                        help="export a heatmap of every recorded path of "
+                             "the generation instead of animating")
+    args = parser.parse_args()
+
+    with open(args.recording, "rb") as save:
+        recorder = trajectory.load_recording(save)
+
+    try:
+        path = recorder.find(args.generation, args.rank)
+    except KeyError:
+        parser.error("no path recorded for that generation and rank")
+
+    if args.heatmap is not None:
+        paths = [other for other in recorder.trajectories
+                 if other.generation == path.generation]
+        export_heatmap(recorder, paths, args.heatmap)
+    elif args.frames is not None:
+        export_frames(Replay(recorder, path), args.frames)
+    else:
+        animate(Replay(recorder, path), args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+"""Evaluation server for external controllers.
+
+Loads a level once and serves the fitness of batches of genomes over a
+local Unix or TCP socket, so optimizers running in other processes can use
+the level as a fitness function.
+
+Every integer is big-endian. A request is a header of a request id
+(uint32), a number of genomes (uint32) and a gene length (uint16), followed
+by one byte per gene, row by row, each an index into genetics.DIRECTIONS.
+A response is a header of the request id (uint32), a status (uint8) and a
+count (uint32). The status is OK followed by count fitnesses (uint32), or
+ERROR followed by a count byte long UTF-8 message.
+
+Requests can be pipelined on a connection and are answered in order.
+Small requests waiting at the same time are evaluated together, and large
+ones are evaluated in parts. A request with more than MAX_GENOMES genomes,
+or a body larger than MAX_REQUEST_SIZE, is answered with an ERROR and the
+connection is closed.
+"""
+
+import os
+import socket
+import struct
+import random
+import asyncio
+import argparse
+
+from typing import List, Tuple, Callable
+
+import numpy as np
+
+# Keeps the server from greeting on import
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import genetics
+import simulation
+
+
+# Framing constants
+REQUEST_HEADER = struct.Struct("!IIH")
+RESPONSE_HEADER = struct.Struct("!IBI")
+FITNESS_TYPE = np.dtype(">u4")
+
+# Response statuses
+OK = 0
+ERROR = 1
+
+# Most genomes evaluated together in one batch, larger requests are split
+MAX_BATCH = 4096
+
+# Most genomes accepted in one request, which also bounds the response
+MAX_GENOMES = 1024 * 1024
+
+# Largest request body accepted, in bytes
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+# Longest time to wait for more requests to batch, in seconds
+BATCH_DELAY = 0.001
+
+# Most requests a connection can have waiting for a response
+MAX_PIPELINE = 64
+
+
+class EvaluationError(Exception):
+    """Raised when a request cannot be evaluated.
+    """
+    pass
+
+
+def _evaluate_python(level: simulation.Level,
+                     genomes: np.ndarray) -> np.ndarray:
+    """Evaluates <genomes> one creature at a time, like the simulation.
+    """
+    gene_length = genomes.shape[1]
+    pop = [genetics.Individual(gene_length, genes, genome)
+           for genes, genome in zip(genetics.genomes_to_genes(genomes),
+                                    genomes)]
+    simulation.evaluate_creatures(level, pop, gene_length)
+    return np.array([ind.fitness for ind in pop])
+
+
+# Evaluation backends by name, fastest first
+BACKENDS = {'numpy': simulation.evaluate_genomes,
+            'python': _evaluate_python}
+
+
+class EvaluationServer:
+    """Serves the fitness of genomes on a single level.
+
+    === Public Attributes ===
+    level:
+        level every genome is evaluated on
+    """
+    level: simulation.Level
+
+    # === Private Attributes ===
+    # _backend:
+    #   function evaluating a matrix of genomes on the level
+    # _max_batch:
+    #   most genomes evaluated together in one batch
+    # _batch_delay:
+    #   longest time to wait for more requests to batch, in seconds
+    # _queue:
+    #   requests waiting to be evaluated, as genome matrices with the
+    #   future their fitnesses are set on
+    _backend: Callable[[simulation.Level, np.ndarray], np.ndarray]
+    _max_batch: int
+    _batch_delay: float
+    _queue: 'asyncio.Queue[Tuple[np.ndarray, asyncio.Future]]'
+
+    def __init__(self, level: simulation.Level, backend: str = 'numpy',
+                 max_batch: int = MAX_BATCH,
+                 batch_delay: float = BATCH_DELAY) -> None:
+        """Initializes the server for <level> using the named backend.
+        """
+        self.level = level
+        self._backend = BACKENDS[backend]
+        self._max_batch = max_batch
+        self._batch_delay = batch_delay
+        self._queue = None
+
+    async def serve(self, unix_path: str = None, host: str = "127.0.0.1",
+                    port: int = 0) -> None:
+        """Serves forever on the Unix socket at <unix_path>, or on <host>
+        and <port> if no path is given.
+        """
+        self._queue = asyncio.Queue()
+        batcher = asyncio.ensure_future(self._run_batches())
+
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self._handle, unix_path)
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+        print("Serving on " + ", ".join(
+            str(sock.getsockname()) for sock in server.sockets))
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    async def evaluate(self, genomes: np.ndarray) -> np.ndarray:
+        """Queues <genomes> to be evaluated with other waiting requests,
+        in parts of at most the largest batch size.
+
+        Returns their fitnesses.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for start in range(0, max(len(genomes), 1), self._max_batch):
+            future = loop.create_future()
+            await self._queue.put(
+                (genomes[start:start + self._max_batch], future))
+            futures.append(future)
+        return np.concatenate(await asyncio.gather(*futures))
+
+    async def _run_batches(self) -> None:
+        """Evaluates waiting requests in batches, forever.
+        """
+        while True:
+            # Waits for a request, then briefly for others to join it
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            if self._batch_delay > 0 and size < self._max_batch:
+                await asyncio.sleep(self._batch_delay)
+
+            # Takes every other request already waiting, up to the limit
+            while size < self._max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                batch.append(item)
+                size += len(item[0])
+
+            # Evaluates together the requests with the same gene length
+            groups = {}
+            for genomes, future in batch:
+                groups.setdefault(genomes.shape[1], []).append(
+                    (genomes, future))
+            for group in groups.values():
+                await self._evaluate_group(group)
+
+    async def _evaluate_group(
+            self, group: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        """Evaluates the requests in <group>, which share a gene length,
+        off the event loop, and sets each request's fitnesses.
+        """
+        genomes = np.concatenate([item[0] for item in group])
+        try:
+            fitness = await asyncio.get_running_loop().run_in_executor(
+                None, self._backend, self.level, genomes)
+        except Exception as error:
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(EvaluationError(str(error)))
+            return
+
+        # Splits the fitnesses back up between the requests
+        start = 0
+        for request_genomes, future in group:
+            end = start + len(request_genomes)
+            if not future.done():
+                future.set_result(fitness[start:end])
+            start = end
+
+    async def _handle(self, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> None:
+        """Reads requests from a connection and queues them for
+        evaluation, while their responses are written in order.
+        """
+        pending = asyncio.Queue(MAX_PIPELINE)
+        responder = asyncio.ensure_future(self._respond(pending, writer))
+        try:
+            # Stops reading once nothing is left to write the responses
+            while not responder.done():
+                try:
+                    header = await reader.readexactly(REQUEST_HEADER.size)
+                except asyncio.IncompleteReadError:
+                    break
+                request_id, count, gene_length = REQUEST_HEADER.unpack(header)
+
+                # Refuses requests too large to hold or answer, and stops
+                # reading since the rest of the stream can no longer be framed
+                if (count > MAX_GENOMES
+                        or count * gene_length > MAX_REQUEST_SIZE):
+                    await _put_unless_done(
+                        pending, (request_id, _failed("request too large")),
+                        responder)
+                    break
+                body = await reader.readexactly(count * gene_length)
+
+                # Starts evaluating right away so requests are pipelined
+                genomes = np.frombuffer(body, dtype=np.uint8).reshape(
+                    count, gene_length)
+                if (genomes >= len(genetics.DIRECTIONS)).any():
+                    task = _failed("gene is not a direction index")
+                else:
+                    task = asyncio.ensure_future(self.evaluate(genomes))
+                if not await _put_unless_done(pending, (request_id, task),
+                                              responder):
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            # Lets the responses already asked for finish, unless the
+            # client is already gone
+            await _put_unless_done(pending, None, responder)
+            await responder
+
+            # Drops any responses that can no longer be written
+            while not pending.empty():
+                pending.get_nowait()
+
+    async def _respond(self, pending: asyncio.Queue,
+                       writer: asyncio.StreamWriter) -> None:
+        """Writes the response of each request in <pending> in order,
+        until a None is found.
+        """
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                request_id, task = item
+                try:
+                    fitness = await task
+                except EvaluationError as error:
+                    message = str(error).encode()
+                    writer.write(RESPONSE_HEADER.pack(
+                        request_id, ERROR, len(message)) + message)
+                else:
+                    writer.write(RESPONSE_HEADER.pack(
+                        request_id, OK, len(fitness)) +
+                        fitness.astype(FITNESS_TYPE).tobytes())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def _put_unless_done(queue: asyncio.Queue, item: object,
+                           task: asyncio.Future) -> bool:
+    """Puts <item> on <queue>, unless <task> finishes while waiting for
+    space.
+
+    Returns whether the item was put.
+    """
+    if task.done():
+        return False
+    if not queue.full():
+        queue.put_nowait(item)
+        return True
+
+    put = asyncio.ensure_future(queue.put(item))
+    await asyncio.wait((put, task), return_when=asyncio.FIRST_COMPLETED)
+    if put.done():
+        return True
+    put.cancel()
+    return False
+
+
+def _failed(message: str) -> asyncio.Future:
+    """Returns a future that has already failed with <message>.
+    """
+    future = asyncio.get_running_loop().create_future()
+    future.set_exception(EvaluationError(message))
+    return future
+
+
+class EvaluationClient:
+    """Blocking client of an evaluation server, for use by optimizers.
+
+    Requests can be pipelined by sending several before receiving.
+    """
+    # === Private Attributes ===
+    # _sock:
+    #   socket connected to the server
+    # _next_id:
+    #   id of the next request sent
+    _sock: socket.socket
+    _next_id: int
+
+    def __init__(self, unix_path: str = None, host: str = "127.0.0.1",
+                 port: int = 0) -> None:
+        """Connects to the server on the Unix socket at <unix_path>, or on
+        <host> and <port> if no path is given.
+        """
+        if unix_path is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(unix_path)
+        else:
+            self._sock = socket.create_connection((host, port))
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._next_id = 0
+
+    def send(self, genomes: np.ndarray) -> int:
+        """Sends <genomes>, a matrix of indices into genetics.DIRECTIONS,
+        to be evaluated without waiting for the result.
+
+        Returns the id of the request.
+        """
+        genomes = np.ascontiguousarray(genomes, dtype=np.uint8)
+        request_id = self._next_id
+        self._next_id = (self._next_id + 1) % 2 ** 32
+        self._sock.sendall(REQUEST_HEADER.pack(request_id, *genomes.shape) +
+                           genomes.tobytes())
+        return request_id
+
+    def receive(self) -> Tuple[int, np.ndarray]:
+        """Waits for the next response, in the order requests were sent.
+
+        Returns the request id and the fitness of each genome.
+        Raises an EvaluationError if the server could not evaluate it.
+        """
+        request_id, status, count = RESPONSE_HEADER.unpack(
+            self._receive_exactly(RESPONSE_HEADER.size))
+        if status == ERROR:
+            raise EvaluationError(self._receive_exactly(count).decode())
+
+        body = self._receive_exactly(count * FITNESS_TYPE.itemsize)
+        return request_id, np.frombuffer(body, dtype=FITNESS_TYPE)
+
+    def evaluate(self, genomes: np.ndarray) -> np.ndarray:
+        """Sends <genomes> and waits for their fitnesses.
+        """
+        self.send(genomes)
+        return self.receive()[1]
+
+    def close(self) -> None:
+        """Closes the connection.
+        """
+        self._sock.close()
+
+    def _receive_exactly(self, size: int) -> bytes:
+        """Receives exactly <size> bytes from the server.
+        """
+        data = bytearray()
+        while len(data) < size:
+            chunk = self._sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("server closed the connection")
+            data.extend(chunk)
+        return bytes(data)
+
+
+def main() -> None:
+    """Runs the evaluation server from the command line.
+    """
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--level", default="",
+                        help="level name from " + simulation.LEVEL_PATH +
+                             " (default: empty level)")
+    parser.add_argument("--chance", type=float, default=0.025,
+                        help="random point frequency (default: 0.025)")
+    parser.add_argument("--seed", type=int,
+                        help="seed of the random points")
+    parser.add_argument("--unix", metavar="PATH",
+                        help="serve on a Unix socket instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="TCP host (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=5557,
+                        help="TCP port (default: 5557)")
+    parser.add_argument("--backend", choices=list(BACKENDS),
+                        default=next(iter(BACKENDS)),
+                        help="evaluation backend (default: fastest)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH,
+                        help="most genomes evaluated together "
+                             "(default: %(default)s)")
+    args = parser.parse_args()
+
+    # Loads the level once for every request
+    random.seed(args.seed)
+    blueprint = None
+    if args.level != "":
+        blueprint = simulation.load_level(args.level)
+    level = simulation.Level(blueprint=blueprint, chance=args.chance)
+
+    server = EvaluationServer(level, args.backend, args.max_batch)
+    try:
+        asyncio.run(server.serve(args.unix, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -6,7 +6,11 @@ import time
 import random
 import pickle
 
-from typing import List, Tuple, BinaryIO
+from array import array
+from collections import deque
+from typing import List, Tuple, BinaryIO, Optional, Callable
+
+import numpy as np
 
 import pygame
 import pygame.gfxdraw
@@ -14,6 +18,8 @@ import pygame.gfxdraw
 import matplotlib.pyplot as plt
 
 import genetics
+import heatmap
+import trajectory
 
 
 # Screen constants
@@ -24,6 +30,10 @@ SCREEN_TITLE = "Genetic Level Solver"
 TILE_SIZE = 10
 LEVEL_PATH = "levels/"
 
+# Recording constants
+RECORDING_PATH = "recordings/"
+HEATMAP_PATH = "heatmaps/"
+
 # Calculates how many rows and columns of tiles there will be
 NUM_COLUMNS = SCREEN_SIZE[0] // TILE_SIZE
 NUM_ROWS = SCREEN_SIZE[1] // TILE_SIZE
@@ -37,6 +47,16 @@ BLACK = (0, 0, 0)
 # Drawing constants
 COLORS = [BLACK, WHITE, GREEN]
 
+# Displacement of a creature moving in each direction
+DISPLACEMENTS = {'U': (0, -1),
+                 'R': (1, 0),
+                 'D': (0, 1),
+                 'L': (-1, 0),
+                 'UR': (-1, 1),
+                 'UL': (-1, -1),
+                 'DR': (1, 1),
+                 'DL': (1, -1)}
+
 
 class EndSimulation(Exception):
     """Raised when the simulation is ended prematurely.
@@ -64,8 +84,19 @@ class Simulation:
     #   draws the generation's progress every this many generations
     # _interval:
     #   waits this long after each drawing in milliseconds
+    # _record_top:
+    #   records the trajectories of this many of the fittest individuals
+    #   every generation, zero disables recording
+    # _heatmap_step:
+    #   saves the tiles visited by the population every this many
+    #   generations, zero disables the heatmap
+    # _visits:
+    #   heatmap of the current run, or None if it is disabled
     _draw_step: int
     _interval: int
+    _record_top: int
+    _heatmap_step: int
+    _visits: Optional[heatmap.VisitHeatmap]
 
     def __init__(self) -> None:
         """Initalizes this simulation along with physics and display.
@@ -78,6 +109,9 @@ class Simulation:
         self.step_num = 0
         self._draw_step = 0
         self._interval = 0
+        self._record_top = 0
+        self._heatmap_step = 0
+        self._visits = None
 
         # Initializes pygame display with size and title
         pygame.init()
@@ -92,27 +126,49 @@ class Simulation:
         self.level.draw(self.display)
         pygame.display.update()
 
-    def settings(self, draw_step: int = 1, interval: int = 0) -> None:
-        """Update drawing settings.
+    def settings(self, draw_step: int = 1, interval: int = 0,
+                 record_top: int = 0, heatmap_step: int = 0) -> None:
+        """Update drawing and recording settings.
 
         Draws the generation every <draw_step> generations.
         Waits <interval> milliseconds after every draw.
+        Records the paths of the <record_top> fittest individuals of every
+        generation to a file in RECORDING_PATH.
+        Saves how often the population visited each tile to a file in
+        HEATMAP_PATH every <heatmap_step> generations.
         """
         self._draw_step = draw_step
         self._interval = interval
+        self._record_top = record_top
+        self._heatmap_step = heatmap_step
 
     def start(self, generations: int, num_creatures: int,
-              movements: int) -> None:
+              movements: int, config: genetics.GeneticConfig = None) -> None:
         """Starts the simulation and
         runs for <generations> number of generations with
         <num_creatures> number of creatures
         that move <movements> times before dying.
+
+        Uses the default genetic parameters if <config> is not given.
         """
         # Stores fitness levels for statistics
         fitness_levels = []
 
         # Generates a population holder
-        populations = genetics.PopulationController(movements, num_creatures)
+        populations = genetics.PopulationController(movements, num_creatures,
+                                                    config)
+
+        # Generates a trajectory recorder if recording was asked for
+        recorder = None
+        if self._record_top > 0:
+            recorder = trajectory.TrajectoryRecorder(
+                self.level.copy_grid(), Creature.START)
+
+        # Generates a visit heatmap if one was asked for
+        self._visits = None
+        run_name = time.strftime("%Y%m%d-%H%M%S")
+        if self._heatmap_step > 0:
+            self._visits = heatmap.VisitHeatmap((NUM_COLUMNS, NUM_ROWS))
 
         # Runs through the amount of generations needed to simulate
         for i in range(generations):
@@ -125,55 +181,93 @@ class Simulation:
             else:
                 draw = False
 
-            # Gets the current population and creates creatures for each item
+            # Gets the current population
             pop = populations.pop
-            creatures = [Creature(self.level) for _ in range(len(pop))]
-
-            # Runs through each movement required
-            while self.step_num < movements:
-                # Tries to step, ends if a EndSimulation exception was raised
-                try:
-                    self.step(creatures, pop)
-                except EndSimulation:
-                    pygame.quit()
-                    draw_graph(fitness_levels)
-                    return
-
-                # Draws everything if draw is set to true
-                if draw:
-                    self.draw(creatures, self._interval)
 
-            # Updates each individual's fitness based off the number of points
-            # they gathered in that generation
-            for j, ind in enumerate(pop):
-                ind.fitness = creatures[j].points
+            # Moves the population through the level, updating each
+            # individual's fitness, and ends if a EndSimulation exception
+            # was raised
+            try:
+                if draw:
+                    evaluate(self.level, pop, movements, self._visits,
+                             self.step)
+                else:
+                    evaluate(self.level, pop, movements, self._visits)
+                    self.handle_events()
+            except EndSimulation:
+                pygame.quit()
+                if recorder is not None:
+                    save_recording(recorder)
+                if self._visits is not None and self._visits.total() > 0:
+                    save_heatmap(self._visits, run_name, i)
+                draw_graph(fitness_levels)
+                return
+
+            # Records the paths of the fittest individuals if required
+            if recorder is not None:
+                self.record(recorder, i, pop)
+
+            # Saves the visits of the last <heatmap_step> generations
+            if self._visits is not None and (i + 1) % self._heatmap_step == 0:
+                save_heatmap(self._visits, run_name, i)
+                self._visits.reset()
 
             # Appends the fitness statistics to the fitness level tracker
             fitness_levels.append(populations.calculate_fitness_statistics())
             # Creates a new generation
             populations.create_new_generation()
 
+        # Saves the recorded paths and any leftover visits
+        if recorder is not None:
+            save_recording(recorder)
+        if self._visits is not None and self._visits.total() > 0:
+            save_heatmap(self._visits, run_name, generations - 1)
+
         # Draws statistics
         draw_graph(fitness_levels)
 
-    def step(self, creatures: List['Creature'],
-             pop: List[genetics.Individual]) -> None:
-        """Runs a step in the simulation.
+    def record(self, recorder: trajectory.TrajectoryRecorder,
+               generation: int, pop: List[genetics.Individual]) -> None:
+        """Records the paths of the fittest individuals in <pop> during
+        generation <generation> to <recorder>.
 
-        Updates each creature in <creatures>.
+        Only the recorded individuals are moved again, the rest of the
+        population is left untouched.
         """
-        # Runs through each creature and moves accordingly
-        for i, creature in enumerate(creatures):
-            creature.move(pop[i].genes[self.step_num])
+        # Gets the fittest individuals
+        sorted_pop = sorted(pop, key=lambda x: x.fitness, reverse=True)
+
+        for rank, ind in enumerate(sorted_pop[:self._record_top]):
+            # Moves a recording creature through the individual's genes
+            creature = Creature(self.level, record=True)
+            for gene in ind.genes:
+                creature.move(gene)
+
+            # Adds its path to the recorder
+            recorder.add(trajectory.Trajectory(
+                generation, rank, ind.fitness, creature.trail))
+
+    def step(self, creatures: List['Creature']) -> None:
+        """Shows a step of the simulation once <creatures> have moved.
+
+        Draws the creatures and handles closing the window.
+        """
+        self.draw(creatures, self._interval)
+        self.handle_events()
+
+        # Increments step
+        self.step_num += 1
+
+    def handle_events(self) -> None:
+        """Handles PyGame events.
 
+        Raises an EndSimulation exception if the window was closed.
+        """
         # Close event handler, raises an EndSimulation exception
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 raise EndSimulation
 
-        # Increments step
-        self.step_num += 1
-
     def draw(self, creatures: List['Creature'], interval: int = 0) -> None:
         """Draws the level and all the passed in creatures,
         then waits <interval> milliseconds.
@@ -242,20 +336,26 @@ class Level:
         # Sets the background
         display.fill(COLORS[0])
 
-        # Draws each tile in the grid
+        # Draws each tile in the grid that is not empty
         for i in range(len(self._grid)):
             for j in range(len(self._grid[i])):
-                # Calculates the left and top
-                left = i * TILE_SIZE
-                top = j * TILE_SIZE
-                # Gets the tile index
-                index = self._grid[i][j]
-
-                # Draws the tile if it is not empty
-                if index == 1 or index == 2:
-                    # Creates the rectangle and draws it
-                    tile_rect = pygame.Rect(left, top, TILE_SIZE, TILE_SIZE)
-                    pygame.gfxdraw.box(display, tile_rect, COLORS[index])
+                if self._grid[i][j] != 0:
+                    self.draw_tile(display, (i, j))
+
+    def draw_tile(self, display: pygame.Surface,
+                  position: Tuple[int, int]) -> pygame.Rect:
+        """Draws the single tile at the given position to the given PyGame
+        display, covering whatever was drawn there before.
+
+        Returns the rectangle that was drawn.
+        """
+        # Creates the rectangle and draws it
+        tile_rect = pygame.Rect(position[0] * TILE_SIZE,
+                                position[1] * TILE_SIZE,
+                                TILE_SIZE, TILE_SIZE)
+        pygame.gfxdraw.box(display, tile_rect,
+                           COLORS[self.get_tile_at(position)])
+        return tile_rect
 
     def get_tile_at(self, position: Tuple[int, int]) -> int:
         """Gets the tile at the given position.
@@ -264,6 +364,53 @@ class Level:
         """
         return self._grid[position[0]][position[1]]
 
+    def fill_rect(self, corner1: Tuple[int, int], corner2: Tuple[int, int],
+                  tile: int) -> List[Tuple[int, int]]:
+        """Sets every tile in the rectangle between the two corners,
+        inclusive, to the integer representation.
+
+        Returns the positions that changed.
+        """
+        changed = []
+        for i in range(min(corner1[0], corner2[0]),
+                       max(corner1[0], corner2[0]) + 1):
+            for j in range(min(corner1[1], corner2[1]),
+                           max(corner1[1], corner2[1]) + 1):
+                if self._grid[i][j] != tile:
+                    self._grid[i][j] = tile
+                    changed.append((i, j))
+        return changed
+
+    def flood_fill(self, position: Tuple[int, int],
+                   tile: int) -> List[Tuple[int, int]]:
+        """Sets the tile at the given position, and every tile of the same
+        kind connected to it by a side, to the integer representation.
+
+        Returns the positions that changed.
+        """
+        target = self.get_tile_at(position)
+        if target == tile:
+            return []
+
+        # Fills outwards from the position without looping around the edges
+        changed = []
+        self.set_tile_at(position, tile)
+        queue = deque([position])
+        while queue:
+            i, j = queue.popleft()
+            changed.append((i, j))
+            for x, y in ((i + 1, j), (i - 1, j), (i, j + 1), (i, j - 1)):
+                if (0 <= x < len(self._grid) and 0 <= y < len(self._grid[x])
+                        and self._grid[x][y] == target):
+                    self._grid[x][y] = tile
+                    queue.append((x, y))
+        return changed
+
+    def copy_grid(self) -> List[List[int]]:
+        """Returns a copy of the grid as a list of columns.
+        """
+        return [column[:] for column in self._grid]
+
     def set_tile_at(self, position: Tuple[int, int], tile: int) -> None:
         """Sets the tile at the given position to the integer representation.
         """
@@ -283,9 +430,16 @@ class Creature:
         Level this creature is in
     points:
         number of points this creature has collected
+    trail:
+        packed array of the x and y displacements actually taken on each
+        move, or None if this creature is not recording
     """
     level: 'Level'
     points: int
+    trail: Optional[array]
+
+    # Starting position of every creature, the middle of the level
+    START = (NUM_COLUMNS // 2, NUM_ROWS // 2)
 
     # === Private Attributes ===
     # _x_coord:
@@ -298,16 +452,20 @@ class Creature:
     _y_coord: int
     _visited: List[Tuple[int, int]]
 
-    def __init__(self, level: 'Level') -> None:
+    def __init__(self, level: 'Level', record: bool = False) -> None:
         """Initializes the creature in the given level.
+
+        Records every displacement taken into <trail> if <record> is set.
         """
         # Initializes the level and the number of points
         self.level = level
         self.points = 0
 
+        # Signed bytes are enough since a displacement is at most one tile
+        self.trail = array('b') if record else None
+
         # Sets the position to the middle and sets that to be a visited place
-        self._x_coord = NUM_COLUMNS // 2
-        self._y_coord = NUM_ROWS // 2
+        self._x_coord, self._y_coord = Creature.START
         self._visited = [(self._x_coord, self._y_coord)]
 
     def _try_move(self, displacement: Tuple[int, int]) -> None:
@@ -325,6 +483,13 @@ class Creature:
             self._x_coord = move_x
             self._y_coord = move_y
 
+        # Records the displacement that was actually taken
+        if self.trail is not None:
+            if status != 1:
+                self.trail.extend(displacement)
+            else:
+                self.trail.extend((0, 0))
+
         # Collects the point if it is a point
         if status == 2:
             pos = (self._x_coord, self._y_coord)
@@ -333,25 +498,17 @@ class Creature:
                 self._visited.append(pos)
                 self.points += 1
 
+    def get_cell(self) -> int:
+        """Gets the index of this creature's tile in a flattened grid,
+        which is column * NUM_ROWS + row.
+        """
+        return self._x_coord * NUM_ROWS + self._y_coord
+
     def move(self, direction: str) -> None:
         """Moves the creature in the given direction.
         """
-        if direction == 'U':
-            self._try_move((0, -1))
-        elif direction == 'R':
-            self._try_move((1, 0))
-        elif direction == 'D':
-            self._try_move((0, 1))
-        elif direction == 'L':
-            self._try_move((-1, 0))
-        elif direction == 'UR':
-            self._try_move((-1, 1))
-        elif direction == 'UL':
-            self._try_move((-1, -1))
-        elif direction == 'DR':
-            self._try_move((1, 1))
-        elif direction == 'DL':
-            self._try_move((1, -1))
+        if direction in DISPLACEMENTS:
+            self._try_move(DISPLACEMENTS[direction])
 
     def draw(self, display: pygame.Surface) -> None:
         """Draws this creature to the given PyGame display.
@@ -368,6 +525,142 @@ class Creature:
         pygame.draw.rect(display, color, tile_rect)
 
 
+def evaluate(level: 'Level', pop: List[genetics.Individual], movements: int,
+             visits: heatmap.VisitHeatmap = None,
+             on_step: Callable[[List['Creature']], None] = None) -> None:
+    """Moves a creature for every individual in <pop> through <level>
+    <movements> times, and sets each individual's fitness to the number of
+    points its creature gathered.
+
+    Counts where the creatures go in <visits> if it is given, and calls
+    <on_step> with the creatures after every step if it is given.
+    Without <on_step> the whole population is moved at once.
+    """
+    if on_step is not None:
+        evaluate_creatures(level, pop, movements, visits, on_step)
+        return
+
+    genomes = genetics.individuals_to_genomes(pop)[:, :movements]
+    fitness = evaluate_genomes(level, genomes, visits)
+    for i, ind in enumerate(pop):
+        ind.fitness = int(fitness[i])
+
+
+def evaluate_creatures(level: 'Level', pop: List[genetics.Individual],
+                       movements: int, visits: heatmap.VisitHeatmap = None,
+                       on_step: Callable[[List['Creature']], None] = None
+                       ) -> None:
+    """Does the same as evaluate, but always moves one Creature at a time.
+    """
+    creatures = [Creature(level) for _ in range(len(pop))]
+
+    # Keeps where every creature is after each step to count them at once
+    if visits is not None:
+        cells = np.empty((movements, len(creatures)), dtype=np.intp)
+
+    # Moves every creature through its individual's genes
+    for step_num in range(movements):
+        for i, creature in enumerate(creatures):
+            creature.move(pop[i].genes[step_num])
+
+        if visits is not None:
+            cells[step_num] = list(map(Creature.get_cell, creatures))
+
+        if on_step is not None:
+            on_step(creatures)
+
+    if visits is not None:
+        visits.add(cells)
+
+    # Updates each individual's fitness
+    for i, ind in enumerate(pop):
+        ind.fitness = creatures[i].points
+
+
+def evaluate_genomes(level: 'Level', genomes: np.ndarray,
+                     visits: heatmap.VisitHeatmap = None) -> np.ndarray:
+    """Moves a creature for every row of <genomes>, a matrix of indices into
+    genetics.DIRECTIONS, through <level> all at once.
+
+    Counts where the creatures go in <visits> if it is given.
+    Returns the number of points each creature gathered, the same as
+    evaluate_creatures would give.
+    """
+    num_genomes, gene_length = genomes.shape
+    tiles = np.array(level.copy_grid(), dtype=np.uint8).reshape(-1)
+
+    # Displacements of each direction index
+    delta_x = np.array([DISPLACEMENTS[direction][0]
+                        for direction in genetics.DIRECTIONS])
+    delta_y = np.array([DISPLACEMENTS[direction][1]
+                        for direction in genetics.DIRECTIONS])
+
+    # Numbers every point tile, other tiles share the extra last number,
+    # so that only collected points need to be remembered
+    point_cells = np.flatnonzero(tiles == 2)
+    point_index = np.full(tiles.size, point_cells.size, dtype=np.intp)
+    point_index[point_cells] = np.arange(point_cells.size)
+    collected = np.zeros((num_genomes, point_cells.size + 1), dtype=bool)
+
+    # Starts every creature in the middle, which counts as visited
+    x_coords = np.full(num_genomes, Creature.START[0], dtype=np.intp)
+    y_coords = np.full(num_genomes, Creature.START[1], dtype=np.intp)
+    collected[:, point_index[Creature.START[0] * NUM_ROWS +
+                             Creature.START[1]]] = True
+    points = np.zeros(num_genomes, dtype=np.int64)
+    rows = np.arange(num_genomes)
+
+    # Keeps where every creature is after each step to count them at once
+    if visits is not None:
+        cells_visited = np.empty((gene_length, num_genomes), dtype=np.intp)
+
+    for step_num in range(gene_length):
+        genes = genomes[:, step_num]
+
+        # Gets the positions to move to, looping the board at the ends
+        move_x = (x_coords + delta_x[genes]) % NUM_COLUMNS
+        move_y = (y_coords + delta_y[genes]) % NUM_ROWS
+        cells = move_x * NUM_ROWS + move_y
+        status = tiles[cells]
+
+        # Moves the creatures that are not walking into a wall
+        free = status != 1
+        x_coords = np.where(free, move_x, x_coords)
+        y_coords = np.where(free, move_y, y_coords)
+        if visits is not None:
+            np.add(x_coords * NUM_ROWS, y_coords, out=cells_visited[step_num])
+
+        # Collects the points that have not been collected before
+        index = point_index[cells]
+        new = (index < point_cells.size) & ~collected[rows, index]
+        collected[rows, index] = True
+        points += new
+
+    if visits is not None:
+        visits.add(cells_visited)
+    return points
+
+
+def evolve(level: 'Level', generations: int, num_creatures: int,
+           movements: int, config: genetics.GeneticConfig = None
+           ) -> List[Tuple[float, float, float]]:
+    """Runs the genetic algorithm on <level> without a display, the same
+    way Simulation.start does.
+
+    Returns the fitness statistics of every generation.
+    """
+    fitness_levels = []
+    populations = genetics.PopulationController(movements, num_creatures,
+                                                config)
+
+    for _ in range(generations):
+        evaluate(level, populations.pop, movements)
+        fitness_levels.append(populations.calculate_fitness_statistics())
+        populations.create_new_generation()
+
+    return fitness_levels
+
+
 def _generate_empty_grid() -> List[List[int]]:
     """Generates an empty grid.
     """
@@ -393,6 +686,33 @@ def _generate_boxed_grid() -> List[List[int]]:
     return grid
 
 
+def save_recording(recorder: trajectory.TrajectoryRecorder) -> None:
+    """Saves the recorded paths to a timestamped file in RECORDING_PATH.
+    """
+    # Creates the recordings directory if it did not exist
+    if not os.path.exists(RECORDING_PATH):
+        os.mkdir(RECORDING_PATH)
+
+    name = time.strftime("%Y%m%d-%H%M%S")
+    with open(RECORDING_PATH + name, "wb+") as save:
+        recorder.dump(save)
+    print("Recorded paths saved to " + RECORDING_PATH + name)
+
+
+def save_heatmap(visits: heatmap.VisitHeatmap, run_name: str,
+                 generation: int) -> None:
+    """Saves the visit counts of run <run_name> up to and including
+    <generation> to a file in HEATMAP_PATH.
+    """
+    # Creates the heatmaps directory if it did not exist
+    if not os.path.exists(HEATMAP_PATH):
+        os.mkdir(HEATMAP_PATH)
+
+    name = "%s-%05d.npy" % (run_name, generation)
+    with open(HEATMAP_PATH + name, "wb+") as save:
+        visits.dump(save)
+
+
 def ask_level() -> List:
     """Asks for the level to load.
 
@@ -422,13 +742,20 @@ def ask_level() -> List:
             return []
 
         # Loads and returns the level if all is well
-        return pickle.load(open(LEVEL_PATH + level, "rb"))
+        return load_level(level)
 
     # If the path does not exist, then return
     input("No levels found. Press enter to continue. ")
     return []
 
 
+def load_level(name: str) -> List[List[int]]:
+    """Loads the grid of the level called <name> from LEVEL_PATH.
+    """
+    with open(LEVEL_PATH + name, "rb") as save:
+        return pickle.load(save)
+
+
 def ask_points() -> float:
     """Asks if points should be randomly placed and the frequency if yes.
 
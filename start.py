@@ -59,10 +59,15 @@ def main() -> None:
         movs = prompt("Number of Moves per Creature (default: 100): ", 100)
         step = prompt("Evolution Step (default: 10): ", 10)
         interval = prompt("Movement interval in ms (default: 0): ", 0)
+        record = prompt("Number of best paths to record per generation " +
+                        "(default: 0): ", 0)
+        heat = prompt("Save a visit heatmap every this many generations " +
+                      "(default: 0): ", 0)
 
         # Starts the simulation with the given parameters
         sim = simulation.Simulation()
-        sim.settings(draw_step=step, interval=interval)
+        sim.settings(draw_step=step, interval=interval, record_top=record,
+                     heatmap_step=heat)
         sim.start(gens, num, movs)
 
 
@@ -0,0 +1,272 @@
+"""Parameter sweeps of the genetic algorithm.
+
+Runs a grid, or a random search, of genetic parameters and levels over
+several seeds on a pool of processes without a display. Runs already in the
+results store are skipped, and a summary table of the fitness reached
+against wall time is written at the end.
+"""
+
+import os
+import csv
+import json
+import time
+import random
+import argparse
+import itertools
+import concurrent.futures
+
+from typing import List, Dict, Any
+
+# Keeps every worker process from greeting on import
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import genetics
+import simulation
+
+
+# Sweep constants
+SWEEP_PATH = "sweeps/"
+
+# Parameters that can be swept, in the order they are shown in the summary
+PARAMETERS = ('level', 'num_creatures', 'movements',
+              'top_percentage', 'mutation_threshold')
+
+# Parameters that are integers rather than floats when randomly searched
+INTEGER_PARAMETERS = ('num_creatures', 'movements')
+
+
+class ResultStore:
+    """Results of finished runs, kept in a file with one JSON object per
+    line so that a sweep can be stopped and picked up again.
+
+    === Public Attributes ===
+    results:
+        results of the finished runs keyed by run_key
+    """
+    results: Dict[str, Dict[str, Any]]
+
+    # === Private Attributes ===
+    # _filename:
+    #   file the results are stored in
+    _filename: str
+
+    def __init__(self, filename: str) -> None:
+        """Initializes the store, loading any results already in <filename>.
+        """
+        self._filename = filename
+        self.results = {}
+
+        if os.path.exists(filename):
+            with open(filename) as store:
+                for line in store:
+                    if line.strip():
+                        result = json.loads(line)
+                        self.results[run_key(result['run'])] = result
+
+    def __contains__(self, run: Dict[str, Any]) -> bool:
+        """Returns whether <run> has already finished.
+        """
+        return run_key(run) in self.results
+
+    def add(self, result: Dict[str, Any]) -> None:
+        """Adds the result of a finished run and writes it to the file.
+        """
+        self.results[run_key(result['run'])] = result
+        with open(self._filename, "a") as store:
+            store.write(json.dumps(result, sort_keys=True) + "\n")
+
+
+def run_key(run: Dict[str, Any]) -> str:
+    """Returns the key identifying <run> in a results store.
+    """
+    return json.dumps(run, sort_keys=True)
+
+
+def grid_runs(space: Dict[str, List[Any]], seeds: List[int],
+              fixed: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Returns a run for every combination of the values in <space> and
+    every seed in <seeds>, each also including the settings in <fixed>.
+    """
+    runs = []
+    for values in itertools.product(*(space[name] for name in PARAMETERS)):
+        for seed in seeds:
+            run = dict(fixed)
+            run.update(zip(PARAMETERS, values))
+            run['seed'] = seed
+            runs.append(run)
+    return runs
+
+
+def random_runs(space: Dict[str, List[Any]], seeds: List[int],
+                fixed: Dict[str, Any], samples: int,
+                rng: random.Random) -> List[Dict[str, Any]]:
+    """Returns <samples> randomly chosen configurations from <space>, run
+    once for every seed in <seeds>, each also including the settings in
+    <fixed>.
+
+    Levels are chosen from the given ones, and every other parameter is
+    chosen uniformly between the smallest and largest of its given values.
+    """
+    runs = []
+    for _ in range(samples):
+        config = {'level': rng.choice(space['level'])}
+        for name in PARAMETERS[1:]:
+            low, high = min(space[name]), max(space[name])
+            if name in INTEGER_PARAMETERS:
+                config[name] = rng.randint(low, high)
+            else:
+                config[name] = round(rng.uniform(low, high), 4)
+
+        for seed in seeds:
+            run = dict(fixed)
+            run.update(config)
+            run['seed'] = seed
+            runs.append(run)
+    return runs
+
+
+def run_configuration(run: Dict[str, Any]) -> Dict[str, Any]:
+    """Evolves a population with the settings of <run> without a display.
+
+    Returns the result of the run, with the final average fitness, the best
+    fitness reached, and the wall time taken in seconds.
+    """
+    # Seeds the run so that it can be repeated
+    random.seed(run['seed'])
+
+    # Loads the level, an empty level name means an empty random level
+    blueprint = None
+    if run['level'] != "":
+        blueprint = simulation.load_level(run['level'])
+    level = simulation.Level(blueprint=blueprint, chance=run['chance'])
+
+    config = genetics.GeneticConfig(run['top_percentage'],
+                                    run['mutation_threshold'])
+
+    # Times only the evolution itself
+    start = time.perf_counter()
+    fitness_levels = simulation.evolve(level, run['generations'],
+                                       run['num_creatures'], run['movements'],
+                                       config)
+    wall_time = time.perf_counter() - start
+
+    return {'run': run,
+            'final_fitness': fitness_levels[-1][2],
+            'best_fitness': max(stat[0] for stat in fitness_levels),
+            'wall_time': wall_time}
+
+
+def sweep(runs: List[Dict[str, Any]], store: 'ResultStore',
+          workers: int = None) -> None:
+    """Runs every run in <runs> not already in <store> on a pool of
+    <workers> processes, adding each result to <store> as it finishes.
+    """
+    pending = [run for run in runs if run not in store]
+    print("%d runs, %d already done." % (len(runs), len(runs) - len(pending)))
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(run_configuration, run) for run in pending]
+        for done, future in enumerate(
+                concurrent.futures.as_completed(futures), 1):
+            result = future.result()
+            store.add(result)
+            print("[%d/%d] best %d, final %.2f, %.1fs" %
+                  (done, len(pending), result['best_fitness'],
+                   result['final_fitness'], result['wall_time']))
+
+
+def summarize(runs: List[Dict[str, Any]], store: 'ResultStore',
+              filename: str) -> None:
+    """Writes a table of the results of <runs> to the CSV file <filename>,
+    averaging over seeds.
+    """
+    # Groups the results of each configuration across seeds
+    groups = {}
+    for run in runs:
+        config = tuple(run[name] for name in PARAMETERS)
+        groups.setdefault(config, []).append(store.results[run_key(run)])
+
+    header = PARAMETERS + ('seeds', 'mean_final_fitness', 'mean_best_fitness',
+                           'max_best_fitness', 'mean_wall_time')
+    rows = []
+    for config, results in groups.items():
+        num = len(results)
+        best = [result['best_fitness'] for result in results]
+        rows.append(config + (
+            num,
+            round(sum(result['final_fitness'] for result in results) / num, 3),
+            round(sum(best) / num, 3),
+            max(best),
+            round(sum(result['wall_time'] for result in results) / num, 3)))
+
+    # Puts the best configurations first
+    rows.sort(key=lambda row: row[-3], reverse=True)
+
+    with open(filename, "w", newline="") as table:
+        writer = csv.writer(table)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def main() -> None:
+    """Runs a sweep from the command line.
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("name", help="name of the sweep, used to store "
+                                     "its results in " + SWEEP_PATH)
+    parser.add_argument("--levels", nargs="+", default=[""],
+                        help="level names from " + simulation.LEVEL_PATH +
+                             ", an empty name is an empty level "
+                             "(default: empty level)")
+    parser.add_argument("--creatures", nargs="+", type=int, default=[100],
+                        help="population sizes (default: 100)")
+    parser.add_argument("--movements", nargs="+", type=int, default=[100],
+                        help="moves per creature (default: 100)")
+    parser.add_argument("--top", nargs="+", type=float,
+                        default=[genetics.TOP_CREATURES_PERCENTAGE],
+                        help="percentages of creatures used to create the "
+                             "next generation (default: %(default)s)")
+    parser.add_argument("--mutation", nargs="+", type=float,
+                        default=[genetics.MUTATION_THRESHOLD],
+                        help="mutation thresholds (default: %(default)s)")
+    parser.add_argument("--generations", type=int, default=250,
+                        help="generations per run (default: 250)")
+    parser.add_argument("--chance", type=float, default=0.025,
+                        help="random point frequency (default: 0.025)")
+    parser.add_argument("--seeds", type=int, default=3,
+                        help="seeds per configuration (default: 3)")
+    parser.add_argument("--random", type=int, metavar="SAMPLES",
+                        help="randomly search this many configurations "
+                             "between the given values instead of "
+                             "running the whole grid")
+    parser.add_argument("--workers", type=int,
+                        help="number of processes (default: all CPUs)")
+    args = parser.parse_args()
+
+    space = {'level': args.levels,
+             'num_creatures': args.creatures,
+             'movements': args.movements,
+             'top_percentage': args.top,
+             'mutation_threshold': args.mutation}
+    fixed = {'generations': args.generations, 'chance': args.chance}
+    seeds = list(range(args.seeds))
+
+    # Random searches are seeded by the sweep name so they can be resumed
+    if args.random is None:
+        runs = grid_runs(space, seeds, fixed)
+    else:
+        runs = random_runs(space, seeds, fixed, args.random,
+                           random.Random(args.name))
+
+    # Creates the sweeps directory if it did not exist
+    if not os.path.exists(SWEEP_PATH):
+        os.mkdir(SWEEP_PATH)
+
+    store = ResultStore(SWEEP_PATH + args.name + ".jsonl")
+    sweep(runs, store, args.workers)
+    summarize(runs, store, SWEEP_PATH + args.name + ".csv")
+    print("Summary written to " + SWEEP_PATH + args.name + ".csv")
+
+
+if __name__ == '__main__':
+    main()
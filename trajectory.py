@@ -0,0 +1,115 @@
+"""Compact recordings of the paths taken by creatures.
+Recordings are made during evolution and replayed offline.
+"""
+
+import pickle
+
+from array import array
+from typing import List, Tuple, BinaryIO
+
+
+class Trajectory:
+    """Path taken by a single individual during a generation.
+
+    === Public Attributes ===
+    generation:
+        generation the individual was evaluated in
+    rank:
+        position of the individual when sorted by fitness, zero is the best
+    fitness:
+        fitness of the individual in that generation
+    deltas:
+        packed array of the x and y displacements taken on each move,
+        stored one after the other
+    """
+    generation: int
+    rank: int
+    fitness: float
+    deltas: array
+
+    def __init__(self, generation: int, rank: int, fitness: float,
+                 deltas: array) -> None:
+        """Initializes the trajectory of an individual.
+        """
+        self.generation = generation
+        self.rank = rank
+        self.fitness = fitness
+        self.deltas = deltas
+
+    def __len__(self) -> int:
+        """Returns the number of moves in this trajectory.
+        """
+        return len(self.deltas) // 2
+
+    def positions(self, start: Tuple[int, int],
+                  size: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Returns every position along this trajectory, including <start>,
+        on a level of <size> columns and rows that loops at its ends.
+        """
+        x, y = start
+        positions = [start]
+        for i in range(0, len(self.deltas), 2):
+            x = (x + self.deltas[i]) % size[0]
+            y = (y + self.deltas[i + 1]) % size[1]
+            positions.append((x, y))
+        return positions
+
+
+class TrajectoryRecorder:
+    """Collection of trajectories recorded on a single level.
+
+    === Public Attributes ===
+    grid:
+        level the trajectories were recorded on as a list of columns
+    start:
+        position every trajectory starts at
+    trajectories:
+        recorded trajectories in the order they were added
+    """
+    grid: List[List[int]]
+    start: Tuple[int, int]
+    trajectories: List['Trajectory']
+
+    def __init__(self, grid: List[List[int]], start: Tuple[int, int]) -> None:
+        """Initializes an empty recorder for the level <grid>.
+        """
+        self.grid = grid
+        self.start = start
+        self.trajectories = []
+
+    def add(self, path: 'Trajectory') -> None:
+        """Adds a trajectory to this recorder.
+        """
+        self.trajectories.append(path)
+
+    def get_size(self) -> Tuple[int, int]:
+        """Returns the number of columns and rows of the recorded level.
+        """
+        return len(self.grid), len(self.grid[0])
+
+    def find(self, generation: int, rank: int = 0) -> 'Trajectory':
+        """Returns the trajectory of the individual with <rank> in
+        <generation>, a negative generation counts from the last one.
+
+        Raises a KeyError if no such trajectory was recorded.
+        """
+        # Resolves negative generations against the last recorded one
+        if generation < 0 and self.trajectories:
+            last = max(path.generation for path in self.trajectories)
+            generation += last + 1
+
+        for path in self.trajectories:
+            if path.generation == generation and path.rank == rank:
+                return path
+        raise KeyError((generation, rank))
+
+    def dump(self, save: BinaryIO) -> None:
+        """Dumps this recorder into a save file using Pickle.
+        """
+        pickle.dump(self, save)
+
+
+def load_recording(save: BinaryIO) -> 'TrajectoryRecorder':
+    """Loads a recorder from a save file made by TrajectoryRecorder.dump.
+    """
+    return pickle.load(save)